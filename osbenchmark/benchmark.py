@@ -51,6 +51,12 @@ def create_arg_parser():
             raise argparse.ArgumentTypeError(f"must be positive but was {value}")
         return value
 
+    def non_negative_float(v):
+        value = float(v)
+        if value < 0:
+            raise argparse.ArgumentTypeError(f"must not be negative but was {value}")
+        return value
+
     def non_empty_list(arg):
         lst = opts.csv_to_list(arg)
         if len(lst) < 1:
@@ -257,6 +263,20 @@ def create_arg_parser():
                                default=0,
                                help="The maximum allowed error rate from a single test within which could indicate a "
                                     "successful run")
+    tuning_parser.add_argument("--early-abort-slack",
+                               type=non_negative_float,
+                               default=None,
+                               help="Abort a test once it runs longer than the best total time so far plus this fraction "
+                                    "of it, e.g. 0.15. Aborted tests have no results (default: disabled).")
+    tuning_parser.add_argument("--telemetry",
+                               default="",
+                               help=f"Enable the provided telemetry devices in every test, provided as a comma-separated "
+                                    f"list. Telemetry adds load on the cluster, so it's disabled by default. List "
+                                    f"possible telemetry devices with `{PROGRAM_NAME} list telemetry`.")
+    tuning_parser.add_argument("--telemetry-params",
+                               default="",
+                               help="Define a comma-separated list of key:value pairs that are injected verbatim to the "
+                                    "telemetry devices as parameters. Ignored unless --telemetry is set.")
     add_workload_source(tuning_parser)
 
     download_parser = subparsers.add_parser("download", help="Downloads an artifact")
@@ -23,23 +23,35 @@
 # under the License.
 
 import os
-import sys
 import csv
+import time
 import uuid
+import contextlib
+import shutil
+import signal
 import logging
 import tempfile
 import subprocess
-from datetime import datetime
+from functools import partial
 from timeit import default_timer as timer
+
+import numpy as np
+
 from osbenchmark.utils import console
 from osbenchmark.tuning.schedule import BatchSizeSchedule, BulkSizeSchedule, ClientSchedule, ScheduleRunner
 from osbenchmark.tuning.result import Result
 
 METRIC_KEY = "Metric"
 TOTAL_TIME_KEY = "Total time"
+# seconds between checks whether a running test should be aborted
+ABORT_CHECK_INTERVAL = 1
+# seconds to wait for an aborted benchmark to shut down before it's killed
+TERMINATE_TIMEOUT = 15
+WORKLOAD_PARAMS_TEMPLATE = "bulk_size:{},batch_size:{},bulk_indexing_clients:{},index_name:{}"
+RESULT_DTYPE = np.dtype([("success", "?"), ("total_time", "i8"), ("error_rate", "f8")])
 
 
-def get_benchmark_params(args, batch_size, bulk_size, number_of_client, temp_output_file):
+def _build_static_params(args):
     params = {}
     params["--target-hosts"] = args.target_hosts
     if args.client_options:
@@ -47,101 +59,190 @@ def get_benchmark_params(args, batch_size, bulk_size, number_of_client, temp_out
     params["--kill-running-processes"] = None
     # we only test remote cluster
     params["--pipeline"] = "benchmark-only"
-    params["--telemetry"] = "node-stats"
-    params["--telemetry-params"] = ("node-stats-include-indices:true,"
-                                    "node-stats-sample-interval:10,"
-                                    "node-stats-include-mem:true,"
-                                    "node-stats-include-process:true")
+    # telemetry adds load on the cluster and skews results, so it's only attached on request, e.g. for a final
+    # confirmation run with the optimal combination
+    if args.telemetry:
+        params["--telemetry"] = args.telemetry
+        if args.telemetry_params:
+            params["--telemetry-params"] = args.telemetry_params
+    elif args.telemetry_params:
+        console.warn("Ignoring --telemetry-params as no telemetry devices are enabled with --telemetry.",
+                     logger=logging.getLogger(__name__))
     params["--workload-path"] = args.workload_path
-    params["--workload-params"] = get_workload_params(batch_size, bulk_size, number_of_client)
+    # spares every test the internet connection probe on startup
+    if args.offline:
+        params["--offline"] = None
     # generate output
     params["--results-format"] = "csv"
-    params["--results-file"] = temp_output_file
-    return params
+    return tuple(params.items())
 
 
-def get_workload_params(batch_size, bulk_size, number_of_client):
-    params = [f"bulk_size:{bulk_size}",
-              f"batch_size:{batch_size}",
-              f"bulk_indexing_clients:{number_of_client}",
-              f"index_name:{generate_random_index_name()}"]
+def get_benchmark_params(static_params, batch_size, bulk_size, number_of_client, temp_output_file):
+    return static_params + (("--workload-params", get_workload_params(batch_size, bulk_size, number_of_client)),
+                            ("--results-file", temp_output_file))
 
-    return ",".join(params)
+
+def get_workload_params(batch_size, bulk_size, number_of_client):
+    return WORKLOAD_PARAMS_TEMPLATE.format(bulk_size, batch_size, number_of_client, generate_random_index_name())
 
 
-def run_benchmark(params):
+def run_benchmark(params, get_time_limit=None):
     commands = ["opensearch-benchmark", "execute-test"]
-    for k, v in params.items():
+    for k, v in params:
         commands.append(k)
         if v:
             commands.append(v)
 
     proc = None
+    # stderr goes to a file rather than a pipe so a chatty benchmark never blocks on a full pipe buffer
+    with tempfile.TemporaryFile() as stderr:
+        try:
+            # own process group, so the actor system processes spawned by the benchmark can be terminated with it
+            proc = subprocess.Popen(
+                commands,
+                stdout=subprocess.DEVNULL,
+                stderr=stderr,
+                start_new_session=True)
+
+            if get_time_limit is not None and wait_or_abort(proc, get_time_limit):
+                return False, None, True
+            if proc.wait() == 0:
+                return True, None, False
+            stderr.seek(0)
+            return False, stderr.read().decode('utf-8', errors='replace'), False
+        except KeyboardInterrupt as e:
+            # the benchmark runs in its own session and doesn't receive the interrupt from the terminal
+            terminate_process_group(proc)
+            console.info("Process is terminated!")
+            raise e
+
+
+def wait_or_abort(proc, get_time_limit):
+    # returns True if the process had to be terminated because it ran longer than the current time limit
+    start = timer()
+    while True:
+        try:
+            proc.wait(timeout=ABORT_CHECK_INTERVAL)
+            return False
+        except subprocess.TimeoutExpired:
+            limit = get_time_limit()
+            if limit is not None and timer() - start > limit:
+                terminate_process_group(proc)
+                return True
+
+
+def terminate_process_group(proc):
+    with contextlib.suppress(ProcessLookupError):
+        os.killpg(proc.pid, signal.SIGTERM)
     try:
-        proc = subprocess.Popen(
-            commands,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE)
+        proc.wait(timeout=TERMINATE_TIMEOUT)
+    except subprocess.TimeoutExpired:
+        logging.getLogger(__name__).warning("Benchmark process [%s] did not terminate within [%d] seconds, killing it.",
+                                            proc.pid, TERMINATE_TIMEOUT)
+    # actor system processes may outlive the benchmark process itself, make sure none of them keeps loading the cluster
+    with contextlib.suppress(ProcessLookupError):
+        os.killpg(proc.pid, signal.SIGKILL)
+    proc.wait()
 
-        _, stderr = proc.communicate()
-        return proc.returncode == 0, stderr.decode('ascii')
-    except KeyboardInterrupt as e:
-        proc.terminate()
-        console.info("Process is terminated!")
-        raise e
+
+# tracks the best total time among acceptable results, tests running longer than that can't be the optimal one
+class DominanceTracker:
+    def __init__(self, allowed_error_rate, slack):
+        self.allowed_error_rate = allowed_error_rate
+        self.slack = slack
+        self._best_time = None
+
+    def time_limit(self):
+        return None if self._best_time is None else self._best_time * (1 + self.slack)
+
+    def update(self, result):
+        if not result.success or result.error_rate > self.allowed_error_rate:
+            return
+        if self._best_time is None or result.total_time < self._best_time:
+            self._best_time = result.total_time
 
 
 def generate_random_index_name():
-    return str(datetime.now().timestamp()) + "_" + str(uuid.uuid4())
+    return f"{time.time_ns()}_{uuid.uuid4().hex}"
+
+
+def parse_output(csvfile):
+    line_reader = csv.reader(csvfile, delimiter=',')
+    header = next(line_reader, None)
+    if not header:
+        return {}
+    metric_idx = header.index(METRIC_KEY)
+    return {row[metric_idx]: dict(zip(header, row)) for row in line_reader}
 
 
-def run_batch_bulk_client_tests(args, test_id, batch, bulk, client):
+def run_batch_bulk_client_tests(args, test_id, batch, bulk, client, static_params, sweep_dir, tracker=None):
     logger = logging.getLogger(__name__)
     result = Result(test_id, batch, bulk, client)
-    _, filename = tempfile.mkstemp()
-    params = get_benchmark_params(args, batch, bulk, client, filename)
+    # the file is removed together with the sweep directory once all tests are done
+    fd, filename = tempfile.mkstemp(dir=sweep_dir)
+    os.close(fd)
+    params = get_benchmark_params(static_params, batch, bulk, client, filename)
 
-    console.info(f"Running benchmark with: bulk size: {bulk}, number of clients: {client}, batch size: {batch}")
+    logger.info("Running benchmark with: bulk size: %d, number of clients: %d, batch size: %d", bulk, client, batch)
+    if not args.quiet:
+        console.info(f"Running benchmark with: bulk size: {bulk}, number of clients: {client}, batch size: {batch}")
     success = False
     err = None
+    aborted = False
     start = timer()
     try:
-        success, err = run_benchmark(params)
+        success, err, aborted = run_benchmark(params, tracker.time_limit if tracker else None)
     finally:
         total_time = int(timer() - start)
-        if success:
+        if aborted:
+            logger.info("Aborted test [%s] after [%d] seconds as it is slower than the best result so far.",
+                        test_id, total_time)
+            result.set_dominated(total_time)
+        elif success:
             with open(filename, 'r', newline='') as csvfile:
-                line_reader = csv.DictReader(csvfile, delimiter=',')
-                output = {}
-                for row in line_reader:
-                    output[row[METRIC_KEY]] = row
+                output = parse_output(csvfile)
                 output[TOTAL_TIME_KEY] = {METRIC_KEY: TOTAL_TIME_KEY, "Task": "", "Value": str(total_time), "Unit": "s"}
                 result.set_output(True, total_time, output)
         else:
             logger.error(err)
             result.set_output(False, total_time, None)
-
-    if os.path.exists(filename):
-        os.remove(filename)
+    if tracker:
+        tracker.update(result)
     return result
 
 
 def batch_bulk_client_tuning(args):
+    # read once and passed down to the abort tracker and the result filter
+    allowed_error_rate = float(args.allowed_error_rate)
     batch_schedule = BatchSizeSchedule(args)
     bulk_schedule = BulkSizeSchedule(args)
     client_schedule = ClientSchedule(args)
-    batches = batch_schedule.steps
-    bulks = bulk_schedule.steps
-    number_of_clients = client_schedule.steps
+    batches = tuple(batch_schedule.steps)
+    bulks = tuple(bulk_schedule.steps)
+    number_of_clients = tuple(client_schedule.steps)
 
     total = len(batches) * len(bulks) * len(number_of_clients)
     console.info(f"There will be {total} tests to run with {len(bulks)} bulk sizes, {len(batches)} batch sizes, "
           f"{len(number_of_clients)} client numbers.")
 
-    schedule_runner = ScheduleRunner(args, batch_schedule, bulk_schedule, client_schedule)
-    results = schedule_runner.run(run_batch_bulk_client_tests)
-    successful_results = get_successful_results(results, float(args.allowed_error_rate))
-    optimal = find_optimal_result(successful_results)
+    schedule_runner = ScheduleRunner(args, batches, bulks, number_of_clients)
+    tracker = DominanceTracker(allowed_error_rate, args.early_abort_slack) if args.early_abort_slack is not None else None
+    sweep_dir = tempfile.mkdtemp(prefix="osb-tune-")
+    try:
+        # parameters which don't vary across tests are only built once per sweep
+        callback = partial(run_batch_bulk_client_tests, static_params=_build_static_params(args), sweep_dir=sweep_dir,
+                           tracker=tracker)
+        results = schedule_runner.run(callback)
+    finally:
+        shutil.rmtree(sweep_dir, ignore_errors=True)
+    dominated = sum(1 for result in results if result.dominated)
+    if dominated:
+        console.info(f"{dominated} of {total} tests were aborted as they ran longer than the best result so far, "
+                     f"they are not included in the published results.")
+    # the results are packed once, the optimum is picked among the successful ones without copying them
+    arr = results_to_array(results)
+    idx = optimal_index(arr, successful_indices(arr, allowed_error_rate))
+    optimal = None if idx is None else results[idx]
     if not optimal:
         console.info("All tests failed, couldn't find any results!")
     else:
@@ -150,22 +251,19 @@ def batch_bulk_client_tuning(args):
     return results
 
 
-def get_successful_results(results, allowed_error_rate):
-    successful_results = []
-    for result in results:
-        if result.success and result.error_rate <= allowed_error_rate:
-            successful_results.append(result)
-    return successful_results
+def results_to_array(results):
+    return np.array([(bool(result.success), result.total_time, result.error_rate) for result in results],
+                    dtype=RESULT_DTYPE)
+
+
+def successful_indices(arr, allowed_error_rate):
+    return np.flatnonzero(arr["success"] & (arr["error_rate"] <= allowed_error_rate))
 
 
-def find_optimal_result(results):
-    total_time = sys.maxsize
-    optimal = None
-    for result in results:
-        if result.total_time < total_time:
-            total_time = result.total_time
-            optimal = result
-    return optimal
+def optimal_index(arr, indices):
+    if indices.size == 0:
+        return None
+    return int(indices[arr["total_time"][indices].argmin()])
 
 
 def run(args):
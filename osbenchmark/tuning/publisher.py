@@ -133,6 +133,8 @@ def write_results(results_format, numbers_align, results_file, cwd, results):
     else:
         raise exceptions.SystemSetupError("Unknown publish format '%s'" % results_format)
 
+    # failed and aborted tests have no output to publish
+    results = [result for result in results if result.output]
     headers = ["Metric", "Task"]
     for result in results:
         headers.append(str(result))
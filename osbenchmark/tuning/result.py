@@ -36,6 +36,7 @@ class Result:
         self.total_time = 0
         self.error_rate = 0
         self.output = None
+        self.dominated = False
 
     def set_output(self, success, total_time, output):
         self.success = success
@@ -46,5 +47,11 @@ class Result:
         if output and ERROR_RATE_KEY in output:
             self.error_rate = float(output[ERROR_RATE_KEY][VALUE_KEY])
 
+    def set_dominated(self, total_time):
+        # aborted because it was already slower than the best result, it's neither successful nor a failure
+        self.success = False
+        self.dominated = True
+        self.total_time = total_time
+
     def __str__(self):
         return f"bulk size: {self.bulk_size}, batch size: {self.batch_size}, number of clients: {self.number_of_client}"
@@ -116,15 +116,14 @@ class ClientSchedule(Schedule):
 
 
 class ScheduleRunner:
-    def __init__(self, args, *schedules):
-        self.schedules = list(schedules)
+    def __init__(self, args, *steps):
+        self.steps = steps
         self.args = args
 
     def run(self, callback):
-        results = []
-        schedule_list = [schedule.steps for schedule in self.schedules]
-        for args in list(itertools.product(*schedule_list)):
+        combinations = list(itertools.product(*self.steps))
+        results = [None] * len(combinations)
+        for idx, args in enumerate(combinations):
             test_id = str(uuid.uuid4())
-            result = callback(self.args, test_id, *args)
-            results.append(result)
+            results[idx] = callback(self.args, test_id, *args)
         return results
@@ -22,10 +22,43 @@
 # specific language governing permissions and limitations
 # under the License.
 
+import io
+import itertools
+import signal
+import subprocess
+from unittest import mock
+from types import SimpleNamespace
 import pytest
-from osbenchmark.tuning.optimal_finder import find_optimal_result, get_successful_results
+from osbenchmark.tuning.optimal_finder import parse_output, get_benchmark_params, _build_static_params, \
+    wait_or_abort, DominanceTracker, batch_bulk_client_tuning, run_benchmark, run_batch_bulk_client_tests, \
+    terminate_process_group, results_to_array, successful_indices, optimal_index
 from osbenchmark.tuning.result import Result
 
+MOCK_PID_VALUE = 1234
+
+
+class MockPopen:
+    def __init__(self, timeouts=0, returncode=0, stderr_output=b""):
+        self.pid = MOCK_PID_VALUE
+        self.returncode = None
+        # number of calls to wait with a timeout which time out before the process exits
+        self.timeouts = timeouts
+        self.exit_code = returncode
+        self.stderr_output = stderr_output
+        self.popen_kwargs = None
+
+    def __call__(self, commands, **kwargs):
+        self.popen_kwargs = kwargs
+        kwargs["stderr"].write(self.stderr_output)
+        return self
+
+    def wait(self, timeout=None):
+        if timeout is not None and self.timeouts > 0:
+            self.timeouts -= 1
+            raise subprocess.TimeoutExpired("opensearch-benchmark", timeout)
+        self.returncode = self.exit_code
+        return self.returncode
+
 
 @pytest.fixture()
 def results():
@@ -36,27 +69,199 @@ def results():
     return [result1, result2, result3, result4]
 
 
-def test_find_optimal_result(results):
+def tuning_args(**kwargs):
+    args = {"target_hosts": "localhost:9200", "client_options": None, "workload_path": "/tmp/workload",
+            "offline": False, "telemetry": "", "telemetry_params": "", "quiet": True, "allowed_error_rate": 0,
+            "early_abort_slack": 0.15, "batch_size": 1, "batch_size_schedule": None, "bulk_size": 100,
+            "bulk_size_schedule": "@100:200:300", "client": 1, "client_schedule": None,
+            "remote_ml_server_type": "unknown"}
+    args.update(kwargs)
+    return SimpleNamespace(**args)
+
+
+def test_optimal_index(results):
     results[0].set_output(True, 25, None)
     results[1].set_output(True, 15, None)
     results[2].set_output(True, 45, None)
     results[3].set_output(True, 125, None)
-    assert find_optimal_result(results).test_id == "id2"
+    arr = results_to_array(results)
+    assert results[optimal_index(arr, successful_indices(arr, 0))].test_id == "id2"
+
+
+def test_optimal_index_among_successful_results(results):
+    results[0].set_output(True, 25, {"error rate": {"Value": 0.2}})
+    results[1].set_output(False, 15, None)
+    results[2].set_output(True, 45, None)
+    results[3].set_output(True, 35, None)
+    arr = results_to_array(results)
+    assert optimal_index(arr, successful_indices(arr, 0.1)) == 3
+    assert optimal_index(arr, successful_indices(arr, 0.2)) == 0
+    assert optimal_index(arr, successful_indices(arr[:2], 0.1)) is None
 
 
-def test_get_successful_results_all_failed(results):
+def test_successful_indices_all_failed(results):
     results[0].set_output(False, 25, None)
     results[1].set_output(False, 15, None)
     results[2].set_output(False, 45, None)
     results[3].set_output(False, 125, None)
-    assert len(get_successful_results(results, 0)) == 0
+    arr = results_to_array(results)
+    assert successful_indices(arr, 0).size == 0
+    assert optimal_index(arr, successful_indices(arr, 0)) is None
 
 
-def test_get_successful_ids_error_rate(results):
+def test_successful_indices_error_rate(results):
     results[0].set_output(False, 25, {"error rate": {"Value": 0.1}})
     results[1].set_output(True, 15, {"error rate": {"Value": 0.2}})
     results[2].set_output(True, 45, {"error rate": {"Value": 0.3}})
     results[3].set_output(True, 125, {"error rate": {"Value": 0.4}})
-    assert len(get_successful_results(results, 0.21)) == 1
-    assert len(get_successful_results(results, 0.31)) == 2
-    assert len(get_successful_results(results, 0.4)) == 3
+    arr = results_to_array(results)
+    assert list(successful_indices(arr, 0.21)) == [1]
+    assert list(successful_indices(arr, 0.31)) == [1, 2]
+    assert list(successful_indices(arr, 0.4)) == [1, 2, 3]
+
+
+def test_optimal_index_empty():
+    arr = results_to_array([])
+    assert optimal_index(arr, successful_indices(arr, 0)) is None
+
+
+def test_parse_output():
+    csvfile = io.StringIO("Metric,Task,Value,Unit\r\n"
+                          "Min Throughput,bulk,100.5,docs/s\r\n"
+                          "error rate,bulk,0.00,%\r\n")
+    output = parse_output(csvfile)
+    assert output == {
+        "Min Throughput": {"Metric": "Min Throughput", "Task": "bulk", "Value": "100.5", "Unit": "docs/s"},
+        "error rate": {"Metric": "error rate", "Task": "bulk", "Value": "0.00", "Unit": "%"},
+    }
+
+
+def test_parse_output_empty():
+    assert parse_output(io.StringIO("")) == {}
+
+
+def test_get_benchmark_params():
+    args = tuning_args(offline=True)
+    static_params = _build_static_params(args)
+    params = dict(get_benchmark_params(static_params, 10, 100, 2, "/tmp/results.csv"))
+    assert params["--target-hosts"] == "localhost:9200"
+    assert "--client-options" not in params
+    assert "--offline" in params
+    assert "--telemetry" not in params
+    assert params["--workload-path"] == "/tmp/workload"
+    assert params["--results-file"] == "/tmp/results.csv"
+    assert params["--workload-params"].startswith("bulk_size:100,batch_size:10,bulk_indexing_clients:2,index_name:")
+
+
+def test_dominance_tracker(results):
+    tracker = DominanceTracker(0.1, 0.5)
+    assert tracker.time_limit() is None
+    results[0].set_output(True, 20, {"error rate": {"Value": 0.2}})
+    results[1].set_output(False, 10, None)
+    results[2].set_output(True, 40, None)
+    results[3].set_output(True, 30, None)
+    for result in results:
+        tracker.update(result)
+    assert tracker.time_limit() == 45
+
+
+@mock.patch("os.killpg")
+@mock.patch("osbenchmark.tuning.optimal_finder.timer", side_effect=itertools.count())
+def test_wait_or_abort(timer, killpg):
+    proc = MockPopen(timeouts=5, returncode=-15)
+    assert wait_or_abort(proc, lambda: 1.5)
+    assert killpg.call_args_list == [mock.call(MOCK_PID_VALUE, signal.SIGTERM), mock.call(MOCK_PID_VALUE, signal.SIGKILL)]
+    assert proc.returncode == -15
+
+
+@mock.patch("os.killpg")
+def test_wait_or_abort_process_finishes(killpg):
+    proc = MockPopen(timeouts=2)
+    assert not wait_or_abort(proc, lambda: None)
+    killpg.assert_not_called()
+    assert proc.returncode == 0
+
+
+@mock.patch("os.killpg")
+def test_terminate_process_group_kills_stuck_process(killpg):
+    # the process ignores SIGTERM and only exits once it's killed
+    proc = MockPopen(timeouts=1, returncode=-9)
+    terminate_process_group(proc)
+    assert killpg.call_args_list == [mock.call(MOCK_PID_VALUE, signal.SIGTERM), mock.call(MOCK_PID_VALUE, signal.SIGKILL)]
+    assert proc.timeouts == 0
+    assert proc.returncode == -9
+
+
+@mock.patch("os.killpg", side_effect=ProcessLookupError)
+def test_terminate_process_group_already_gone(killpg):
+    proc = MockPopen(returncode=0)
+    terminate_process_group(proc)
+    assert proc.returncode == 0
+
+
+def test_get_benchmark_params_with_telemetry():
+    args = tuning_args(telemetry="node-stats", telemetry_params="node-stats-sample-interval:10")
+    params = dict(get_benchmark_params(_build_static_params(args), 10, 100, 2, "/tmp/results.csv"))
+    assert params["--telemetry"] == "node-stats"
+    assert params["--telemetry-params"] == "node-stats-sample-interval:10"
+    assert "--offline" not in params
+
+
+@mock.patch("osbenchmark.tuning.optimal_finder.console")
+def test_get_benchmark_params_ignores_telemetry_params_without_telemetry(console):
+    args = tuning_args(telemetry_params="node-stats-sample-interval:10")
+    params = dict(get_benchmark_params(_build_static_params(args), 10, 100, 2, "/tmp/results.csv"))
+    assert "--telemetry-params" not in params
+    console.warn.assert_called_once()
+
+
+@mock.patch("os.killpg")
+@mock.patch("osbenchmark.tuning.optimal_finder.timer", side_effect=itertools.count())
+def test_run_benchmark_aborted(timer, killpg):
+    proc = MockPopen(timeouts=5, returncode=-15)
+    with mock.patch("subprocess.Popen", new=proc):
+        assert run_benchmark((("--pipeline", "benchmark-only"),), lambda: 1.5) == (False, None, True)
+    assert proc.popen_kwargs["start_new_session"]
+    assert killpg.call_args_list[0] == mock.call(MOCK_PID_VALUE, signal.SIGTERM)
+
+
+def test_run_benchmark_without_time_limit():
+    proc = MockPopen()
+    with mock.patch("subprocess.Popen", new=proc):
+        assert run_benchmark((("--pipeline", "benchmark-only"),)) == (True, None, False)
+    assert proc.popen_kwargs["start_new_session"]
+
+
+def test_run_benchmark_failure_with_invalid_utf8_stderr():
+    proc = MockPopen(returncode=1, stderr_output=b"error in \xe2\x80\x9cworkload\xe2\x80\x9d \xff\xfe")
+    with mock.patch("subprocess.Popen", new=proc):
+        success, err, aborted = run_benchmark((("--pipeline", "benchmark-only"),))
+    assert not success
+    assert not aborted
+    assert err == "error in \u201cworkload\u201d \ufffd\ufffd"
+
+
+@mock.patch("osbenchmark.tuning.optimal_finder.parse_output")
+@mock.patch("osbenchmark.tuning.optimal_finder.run_benchmark")
+def test_run_batch_bulk_client_tests_aborted(run_benchmark_mock, parse_output_mock, tmp_path):
+    run_benchmark_mock.return_value = (False, None, True)
+    tracker = DominanceTracker(0, 0.15)
+    args = tuning_args()
+    result = run_batch_bulk_client_tests(args, "id1", 1, 100, 1, _build_static_params(args), str(tmp_path), tracker)
+    assert result.dominated
+    assert not result.success
+    assert result.output is None
+    parse_output_mock.assert_not_called()
+    assert tracker.time_limit() is None
+
+
+@mock.patch("osbenchmark.tuning.optimal_finder.console")
+@mock.patch("osbenchmark.tuning.optimal_finder.run_benchmark")
+def test_batch_bulk_client_tuning_reports_dominated_tests(run_benchmark, console):
+    run_benchmark.side_effect = [(True, None, False), (False, None, True), (False, None, True)]
+    results = batch_bulk_client_tuning(tuning_args())
+    assert [result.dominated for result in results] == [False, True, True]
+    messages = [call.args[0] for call in console.info.call_args_list]
+    assert "2 of 3 tests were aborted as they ran longer than the best result so far, " \
+           "they are not included in the published results." in messages
+    assert "The optimal variable combination is: bulk size: 100, batch size: 1, number of clients: 1" in messages
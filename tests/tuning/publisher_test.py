@@ -0,0 +1,44 @@
+# SPDX-License-Identifier: Apache-2.0
+#
+# The OpenSearch Contributors require contributions made to
+# this file be licensed under the Apache-2.0 license or a
+# compatible open source license.
+# Modifications Copyright OpenSearch Contributors. See
+# GitHub history for details.
+# Licensed to Elasticsearch B.V. under one or more contributor
+# license agreements. See the NOTICE file distributed with
+# this work for additional information regarding copyright
+# ownership. Elasticsearch B.V. licenses this file to you under
+# the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#	http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+import csv
+from osbenchmark.tuning.publisher import write_results
+from osbenchmark.tuning.result import Result
+
+
+def test_write_results_skips_results_without_output(tmp_path):
+    successful = Result("id1", 1, 100, 1)
+    successful.set_output(True, 10, {"Total time": {"Metric": "Total time", "Task": "", "Value": "10", "Unit": "s"}})
+    failed = Result("id2", 1, 200, 1)
+    failed.set_output(False, 5, None)
+    dominated = Result("id3", 1, 300, 1)
+    dominated.set_dominated(12)
+    results_file = tmp_path / "results.csv"
+
+    write_results("csv", "right", str(results_file), str(tmp_path), [successful, failed, dominated])
+
+    with open(results_file, newline="", encoding="utf-8") as f:
+        rows = list(csv.reader(f))
+    assert rows == [["Metric", "Task", str(successful), "Unit"],
+                    ["Total time", "", "10", "s"]]
@@ -45,20 +45,13 @@ class TestSchedule(TestCase):
         self.assertEqual([10, 30, 50, 70, 90, 100], schedule.steps)
 
 
-class FakeSchedule:
-    def __init__(self, steps):
-        self.steps = steps
-
-
 def fake_callback(args, test_id, arg1, arg2):
     return {"args": args, "arg1": arg1, "arg2": arg2}
 
 
 class TestScheduleRunner(TestCase):
     def test_ScheduleRunner(self):
-        schedule1 = FakeSchedule([1, 2])
-        schedule2 = FakeSchedule([4, 5])
         args = {}
-        runner = ScheduleRunner(args, schedule1, schedule2)
+        runner = ScheduleRunner(args, [1, 2], [4, 5])
         results = runner.run(fake_callback)
         self.assertEqual({(result["arg1"], result["arg2"]) for result in results}, {(1,4), (2,4), (1,5), (2,5)})